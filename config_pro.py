@@ -124,9 +124,14 @@ BACKUP_RETENTION_DAYS = 30
 EXPORT_FORMATS = ['txt', 'csv', 'json']
 DEFAULT_EXPORT_FORMAT = 'txt'
 INCLUDE_METADATA_IN_EXPORT = True
+SORT_RESULTS_BY_DOMAIN = False  # Ordenar saída por domínio e login (merge sort externo)
+DEDUPE_SORTED_RESULTS = False  # Remover linhas duplicadas durante o merge
+SORT_MERGE_FAN_IN = 64  # Máximo de arquivos temporários abertos por merge
 
 # ================ CONFIGURAÇÕES DE FILTROS AVANÇADOS ================
 ENABLE_ADVANCED_FILTERS = False
+# O termo é buscado na URL inteira; exact_match, whole_word e os padrões
+# de inclusão/exclusão são avaliados apenas sobre o host da URL
 FILTER_OPTIONS = {
     'exact_match': False,
     'case_sensitive': False,
@@ -5,10 +5,14 @@ Autor: VL ~ villanelle | t.me/vi77an
 """
 
 import os
+import re
 import sys
 import time
+import heapq
+import shutil
+import tempfile
 import threading
-from typing import List, Optional, Generator, Tuple
+from typing import Callable, List, Optional, Generator, Iterable, Iterator, Tuple, Pattern, Union
 from pathlib import Path
 import itertools
 from dataclasses import dataclass
@@ -221,7 +225,80 @@ def read_file_in_chunks(file_path: str, chunk_size: int = CHUNK_SIZE) -> Generat
                     break
                 yield chunk
 
-def filter_lines(lines: List[str], search_term: str, progress: SearchProgress) -> List[str]:
+def _extract_host(url: str) -> str:
+    """Extrai o host de uma URL (sem esquema, porta, caminho ou query)"""
+    host = url.split('://', 1)[-1]
+    for sep in ('/', '?', '#', ':'):
+        host = host.split(sep, 1)[0]
+    return host
+
+@dataclass
+class MatchPlan:
+    """Plano de busca compilado a partir de FILTER_OPTIONS e SEARCH_CASE_SENSITIVE"""
+    term: str
+    matcher: Optional[Callable[[str], bool]] = None  # None = substring simples sem case
+
+def _compile_alternation(patterns: List[str], case_sensitive: bool) -> Optional[Pattern[str]]:
+    """Une uma lista de padrões literais em uma única alternância regex"""
+    literals = [p if case_sensitive else p.lower() for p in patterns if p]
+    if not literals:
+        return None
+    # Mais longos primeiro para a alternância não parar em um prefixo
+    literals = sorted(set(literals), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(p) for p in literals))
+
+def compile_match_plan(search_term: str) -> MatchPlan:
+    """
+    Compila o termo de busca e os filtros configurados em um único plano
+    
+    Args:
+        search_term: Termo de busca
+        
+    Returns:
+        MatchPlan: Plano pronto para ser avaliado em cada linha
+    """
+    options = FILTER_OPTIONS if ENABLE_ADVANCED_FILTERS else {}
+    case_sensitive = SEARCH_CASE_SENSITIVE or options.get('case_sensitive', False)
+    term = search_term if case_sensitive else search_term.lower()
+    
+    exact_match = options.get('exact_match', False)
+    
+    # Filtros avaliados sobre o host, do mais barato ao mais caro: igualdade,
+    # alternância de exclusão, alternância de inclusão e palavra inteira
+    host_checks: List[Callable[[str], bool]] = []
+    if exact_match:
+        host_checks.append(lambda host: host == term)
+    exclude = _compile_alternation(options.get('exclude_patterns', []), case_sensitive)
+    if exclude is not None:
+        host_checks.append(lambda host: exclude.search(host) is None)
+    include = _compile_alternation(options.get('include_patterns', []), case_sensitive)
+    if include is not None:
+        host_checks.append(include.search)
+    if options.get('whole_word', False) and not exact_match:
+        host_checks.append(re.compile(rf"(?<!\w){re.escape(term)}(?!\w)").search)
+    
+    if not host_checks:
+        if case_sensitive:
+            return MatchPlan(term, lambda domain: term in domain)
+        return MatchPlan(term)
+    
+    def matcher(domain: str) -> bool:
+        # O termo sempre é testado na URL inteira, como na busca simples;
+        # o host só é extraído para as poucas linhas que passam nesse teste
+        if not case_sensitive:
+            domain = domain.lower()
+        if term not in domain:
+            return False
+        host = _extract_host(domain)
+        for check in host_checks:
+            if not check(host):
+                return False
+        return True
+    
+    return MatchPlan(term, matcher)
+
+def filter_lines(lines: List[str], search_term: str, progress: SearchProgress,
+                 plan: Optional[MatchPlan] = None) -> List[str]:
     """
     Filtra linhas com controle de progresso e cancelamento
     
@@ -229,15 +306,20 @@ def filter_lines(lines: List[str], search_term: str, progress: SearchProgress) -
         lines: Lista de linhas para filtrar
         search_term: Termo de busca
         progress: Objeto de progresso
+        plan: Plano compilado (compilado aqui se não informado)
         
     Returns:
-        List[str]: Linhas que contêm o termo de busca
+        List[str]: Linhas que satisfazem o plano de busca
     """
     if not search_term or progress.is_cancelled:
         return []
         
     resultados = []
-    search_term_lower = search_term.lower()
+    if plan is None:
+        plan = compile_match_plan(search_term)
+    term = plan.term
+    matcher = plan.matcher
+    substring_only = matcher is None
     
     for i, linha in enumerate(lines):
         if progress.is_cancelled:
@@ -249,7 +331,12 @@ def filter_lines(lines: List[str], search_term: str, progress: SearchProgress) -
         partes = linha.rsplit(':', 2)
         if len(partes) == 3:
             dominio_atual, _, _ = partes
-            if search_term_lower in dominio_atual.lower():
+            # Caminho padrão sem filtros: substring inline, sem chamada extra
+            if substring_only:
+                encontrado = term in dominio_atual.lower()
+            else:
+                encontrado = matcher(dominio_atual)
+            if encontrado:
                 resultados.append(linha)
                 progress.found_results += 1
         
@@ -262,10 +349,145 @@ def filter_lines(lines: List[str], search_term: str, progress: SearchProgress) -
     
     return resultados
 
-def search_large_file(file_path: str, search_term: str, progress: SearchProgress) -> List[str]:
+def _result_sort_key(line: str) -> Tuple[str, str, str]:
+    """Chave de ordenação de uma linha URL:LOGIN:SENHA -> (host, login, linha)"""
+    partes = line.rsplit(':', 2)
+    if len(partes) != 3:
+        return line.lower(), '', line
+    url, login, _ = partes
+    return _extract_host(url).lower(), login, line
+
+def _unique(lines: Iterable[str]) -> Iterator[str]:
+    """Remove duplicatas adjacentes de uma sequência já ordenada"""
+    previous = None
+    for line in lines:
+        if line != previous:
+            yield line
+            previous = line
+
+def _write_run(lines: Iterable[str], directory: str) -> str:
+    """Grava um run ordenado em arquivo temporário e retorna o caminho"""
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        for line in lines:
+            file.write(line)
+            file.write('\n')
+    return path
+
+def _merge_runs(paths: List[str], dedupe: bool) -> Iterator[str]:
+    """Merge k-way de runs ordenados, fechando e removendo os arquivos ao final"""
+    files = [open(path, 'r', encoding='utf-8') for path in paths]
+    try:
+        streams = [(line.rstrip('\n') for line in file) for file in files]
+        merged = heapq.merge(*streams, key=_result_sort_key)
+        yield from (_unique(merged) if dedupe else merged)
+    finally:
+        for file in files:
+            file.close()
+        for path in paths:
+            os.remove(path)
+
+class ExternalSorter:
+    """
+    Ordena resultados por domínio e login com memória limitada (merge sort externo)
+    
+    As linhas ficam em um buffer até ele atingir o orçamento de memória; então
+    o buffer é ordenado e gravado como run em arquivo temporário. A iteração
+    (única) faz o merge k-way dos runs e remove os temporários ao final.
+    """
+    
+    def __init__(self, dedupe: bool = False, memory_mb: int = MAX_MEMORY_USAGE_MB):
+        self.dedupe = dedupe
+        # Metade do limite para o buffer; o resto fica para o programa e o merge
+        self.budget = max(1, memory_mb * 1024 * 1024 // 2)
+        self.count = 0
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._runs: List[str] = []
+        self._temp_dir: Optional[str] = None
+    
+    def __len__(self) -> int:
+        """Número de linhas recebidas (antes da remoção de duplicatas)"""
+        return self.count
+    
+    def extend(self, lines: Iterable[str]):
+        """Adiciona linhas, gravando um run sempre que o buffer enche"""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            self._buffer.append(line)
+            # Estimativa: a string, o slot da lista e a chave (tupla + host + login)
+            self._buffered += sys.getsizeof(line) + 256
+            self.count += 1
+            if self._buffered >= self.budget:
+                self._spill()
+    
+    def _sorted_buffer(self) -> Iterable[str]:
+        """Ordena o buffer e aplica a remoção de duplicatas, se ativa"""
+        self._buffer.sort(key=_result_sort_key)
+        return _unique(self._buffer) if self.dedupe else self._buffer
+    
+    def _spill(self):
+        """Grava o buffer atual como run ordenado"""
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='url_hunter_sort_')
+        self._runs.append(_write_run(self._sorted_buffer(), self._temp_dir))
+        self._buffer = []
+        self._buffered = 0
+    
+    def __iter__(self) -> Iterator[str]:
+        try:
+            if not self._runs:
+                # Tudo coube na memória: nenhum arquivo temporário necessário
+                yield from self._sorted_buffer()
+                return
+            if self._buffer:
+                self._spill()
+            
+            # Merges intermediários para respeitar o limite de arquivos abertos
+            fan_in = max(2, SORT_MERGE_FAN_IN)
+            while len(self._runs) > fan_in:
+                self._runs = [_write_run(_merge_runs(self._runs[i:i + fan_in], self.dedupe), self._temp_dir)
+                              for i in range(0, len(self._runs), fan_in)]
+            
+            yield from _merge_runs(self._runs, self.dedupe)
+        finally:
+            self.close()
+    
+    def close(self):
+        """Descarta o buffer e remove os arquivos temporários"""
+        self._buffer = []
+        self._buffered = 0
+        self._runs = []
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+def external_sort_results(lines: Iterable[str], dedupe: bool = False,
+                          memory_mb: int = MAX_MEMORY_USAGE_MB) -> Generator[str, None, None]:
+    """
+    Ordena qualquer sequência de linhas (ex.: um arquivo aberto) com memória limitada
+    
+    Args:
+        lines: Linhas a ordenar
+        dedupe: Remover linhas duplicadas durante o merge
+        memory_mb: Limite de memória em MB
+        
+    Yields:
+        str: Linhas ordenadas, sem quebra de linha
+    """
+    sorter = ExternalSorter(dedupe, memory_mb)
+    sorter.extend(lines)
+    yield from sorter
+
+def search_large_file(file_path: str, search_term: str,
+                      progress: SearchProgress) -> Union[List[str], ExternalSorter]:
     """
     Busca em arquivo grande com processamento em chunks
     Exibe apenas mensagem de início e resumo final.
+    Com SORT_RESULTS_BY_DOMAIN, os resultados vão direto para um ExternalSorter,
+    sem manter a lista completa em memória.
     
     Args:
         file_path: Caminho do arquivo
@@ -273,22 +495,28 @@ def search_large_file(file_path: str, search_term: str, progress: SearchProgress
         progress: Objeto de progresso
         
     Returns:
-        List[str]: Resultados encontrados
+        Union[List[str], ExternalSorter]: Resultados encontrados
     """
-    resultados = []
+    if SORT_RESULTS_BY_DOMAIN:
+        resultados = ExternalSorter(DEDUPE_SORTED_RESULTS)
+    else:
+        resultados = []
+    plan = compile_match_plan(search_term)
     print(f"{Colors.CYAN}[🔍] Processando busca por '{search_term}'... aguarde.{Colors.RESET}")
     start_time = time.time()
     try:
         for chunk in read_file_in_chunks(file_path):
             if progress.is_cancelled:
                 break
-            chunk_results = filter_lines(chunk, search_term, progress)
+            chunk_results = filter_lines(chunk, search_term, progress, plan)
             resultados.extend(chunk_results)
         elapsed = time.time() - start_time
         if not progress.is_cancelled:
             print(f"{Colors.GREEN}✅ Busca concluída em {elapsed:.1f}s | Total: {len(resultados)} resultados{Colors.RESET}")
         else:
             print(f"\n{Colors.YELLOW}[⚠️] Busca cancelada pelo usuário{Colors.RESET}")
+            if isinstance(resultados, ExternalSorter):
+                resultados.close()
     except Exception as e:
         print(f"\n{Colors.RED}[💔] Erro durante a busca: {e}{Colors.RESET}")
     return resultados
@@ -403,7 +631,7 @@ def select_file() -> Optional[Tuple[str, int, float]]:
         except ValueError:
             print(f"{Colors.RED}[💔] Entrada inválida. Digite um número correspondente a um arquivo.{Colors.RESET}")
 
-def save_results(results: List[str], search_term: str) -> str:
+def save_results(results: Union[List[str], ExternalSorter], search_term: str) -> str:
     """Salva os resultados em um arquivo com informações detalhadas"""
     if not results:
         print(f"{Colors.YELLOW}[⚠️] Nenhum resultado para salvar.{Colors.RESET}")
@@ -424,23 +652,45 @@ def save_results(results: List[str], search_term: str) -> str:
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     output_file = os.path.join(resultados_dir, f"{safe_term}_{timestamp}.txt")
     
+    # Gravar em arquivo parcial e renomear no fim: uma falha não deixa saída truncada
+    partial_file = output_file + ".part"
     try:
-        with open(output_file, 'w', encoding='utf-8') as file:
+        with open(partial_file, 'w', encoding='utf-8') as file:
             # Adicionar cabeçalho compacto com informações
             file.write(f"# URL Hunter by VL ~ villanelle | t.me/vi77an\n")
-            file.write(f"# Termo buscado: {search_term} | Data/Hora: {time.strftime('%Y-%m-%d %H:%M:%S')} | Total: {len(results)}\n")
+            file.write(f"# Termo buscado: {search_term} | Data/Hora: {time.strftime('%Y-%m-%d %H:%M:%S')} | Encontrados: {len(results)}\n")
             file.write(f"# {'='*60}\n")
             
-            # Remover quebras de linha dos dados originais
-            cleaned_results = [result.strip() for result in results if result.strip()]
-            file.write('\n'.join(cleaned_results))
+            if isinstance(results, ExternalSorter):
+                # Já ordenados (e sem quebras de linha) durante a busca
+                cleaned_results = iter(results)
+            else:
+                # Remover quebras de linha dos dados originais
+                cleaned_results = (result.strip() for result in results if result.strip())
+                if SORT_RESULTS_BY_DOMAIN:
+                    cleaned_results = external_sort_results(cleaned_results, DEDUPE_SORTED_RESULTS)
+            saved = 0
+            for line in cleaned_results:
+                if saved:
+                    file.write('\n')
+                file.write(line)
+                saved += 1
+        os.replace(partial_file, output_file)
         
         print(f"{Colors.PURPLE}[💚] CONFIRA >> {Colors.GREEN}{output_file}{Colors.RESET}")
-        print(f"{Colors.GREEN}[📊] {len(results)} resultados salvos{Colors.RESET}")
+        if saved != len(results):
+            print(f"{Colors.GREEN}[📊] {saved} resultados salvos ({len(results)} encontrados){Colors.RESET}")
+        else:
+            print(f"{Colors.GREEN}[📊] {saved} resultados salvos{Colors.RESET}")
         return output_file
     except Exception as e:
         print(f"{Colors.RED}[💔] Erro ao salvar arquivo: {e}{Colors.RESET}")
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
         return ""
+    finally:
+        if isinstance(results, ExternalSorter):
+            results.close()
 
 def perform_search(file_path: str, line_count: int) -> bool:
     """